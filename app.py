@@ -4,31 +4,132 @@ Flask web service for audio processing.
 This provides REST API endpoints for the Java backend to call.
 """
 
-from flask import Flask, request, jsonify, render_template, redirect, url_for, flash
-from audio_extractor_simple import SimpleAudioExtractor
+from flask import Flask, request, jsonify, render_template, redirect, url_for, flash, g, send_file, Response, session
 import os
 import tempfile
 import json
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from tab_generator import generate_tab
-import signal
+from cancellation import CancellationToken, DeadlineExceeded, OperationCancelled, WorkMetrics
 import threading
 from functools import wraps
 
 app = Flask(__name__)
 
-# Global extractor instance
-extractor = SimpleAudioExtractor()
+# Global extractor instance, created on first use so that importing the app
+# (gunicorn worker boot, /health probes) does not pay for yt_dlp and numpy.
+_extractor = None
+_extractor_lock = threading.Lock()
+
+def get_extractor():
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                from audio_extractor_simple import SimpleAudioExtractor
+                from stub_downloader import StubDownloader
+                # AUDIO_STUB_FIXTURES swaps YouTube for local files (load testing)
+                _extractor = SimpleAudioExtractor(downloader=StubDownloader.from_env())
+    return _extractor
+
+_result_store = None
+
+def get_result_store():
+    global _result_store
+    if _result_store is None:
+        with _extractor_lock:
+            if _result_store is None:
+                from result_store import ResultStore
+                _result_store = ResultStore(os.path.join(UPLOAD_FOLDER, 'results'))
+    return _result_store
+
+def warm_up():
+    """Import heavy dependencies and create the extractor ahead of the first request."""
+    import numpy  # noqa: F401
+    import yt_dlp  # noqa: F401
+    get_extractor()
+    get_result_store()
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'temp_audio')
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'm4a', 'webm', 'ogg'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'supersecretkey')  # Use env var if available
 
+# Per-request deadline and the number of analysis jobs one worker accepts at once
+REQUEST_TIMEOUT = float(os.environ.get('AUDIO_REQUEST_TIMEOUT', 300))
+MAX_IN_FLIGHT = int(os.environ.get('AUDIO_MAX_IN_FLIGHT', 4))
+work_metrics = WorkMetrics()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def json_cancelled_response(error):
+    status = 504 if isinstance(error, DeadlineExceeded) else 503
+    return jsonify({'error': str(error)}), status
+
+def web_cancelled_response(error):
+    flash(f'Processing stopped: {str(error)}', 'error')
+    return redirect(url_for('index'))
+
+def json_busy_response():
+    return jsonify({'error': 'Server busy, try again later'}), 503
+
+def web_busy_response():
+    flash('Server busy, try again later.', 'error')
+    return redirect(url_for('index'))
+
+def request_failed(response, flashes_before=0):
+    """
+    Whether a view's response reports a failure. The JSON views answer with
+    an error status; the HTML views flash an error and redirect. Only
+    messages flashed after flashes_before belong to this request.
+    """
+    if response.status_code >= 400:
+        return True
+    new_flashes = session.get('_flashes', [])[flashes_before:]
+    return any(category == 'error' for category, _ in new_flashes)
+
+def deadline(seconds, on_cancel=json_cancelled_response, on_busy=json_busy_response):
+    """
+    Run a view with a CancellationToken (available as g.cancel_token) that
+    expires after the given number of seconds.
+
+    The work runs on the request thread and stops at the next cancellation
+    check, so nothing keeps running after the client has been answered.
+    Files tracked on the token are removed when the work is cancelled.
+    Requests beyond MAX_IN_FLIGHT are rejected immediately. Outcomes are
+    counted in work_metrics, with error responses counted as failed.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not work_metrics.try_start(MAX_IN_FLIGHT):
+                return on_busy()
+            g.cancel_token = CancellationToken(timeout=seconds)
+            flashes_before = len(session.get('_flashes', []))
+            try:
+                result = func(*args, **kwargs)
+            except DeadlineExceeded as e:
+                g.cancel_token.release_files()
+                work_metrics.finish('timed_out')
+                print(f"Request timed out: {str(e)}")
+                return on_cancel(e)
+            except OperationCancelled as e:
+                g.cancel_token.release_files()
+                work_metrics.finish('cancelled')
+                print(f"Request cancelled: {str(e)}")
+                return on_cancel(e)
+            except Exception:
+                work_metrics.finish('failed')
+                raise
+            # Views handle their own errors, so classify by what they returned
+            response = app.make_response(result)
+            work_metrics.finish('failed' if request_failed(response, flashes_before) else 'completed')
+            return response
+        return wrapper
+    return decorator
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
@@ -38,15 +139,30 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Counts of completed, failed, cancelled, timed out and shed jobs."""
+    return jsonify({
+        'jobs': work_metrics.snapshot(),
+        'max_in_flight': MAX_IN_FLIGHT,
+        'request_timeout_seconds': REQUEST_TIMEOUT,
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/extract-audio', methods=['POST'])
+@deadline(REQUEST_TIMEOUT)
 def extract_audio():
     """
     Extract audio from YouTube URL.
     
     Expected JSON payload:
     {
-        "youtube_url": "https://www.youtube.com/watch?v=..."
+        "youtube_url": "https://www.youtube.com/watch?v=...",
+        "include_estimates": true  (optional; false returns only result_id)
     }
+    
+    The estimates are also stored and can be fetched page by page from
+    /results/<result_id>, or as .npz / .mid files.
     """
     try:
         data = request.get_json()
@@ -56,9 +172,10 @@ def extract_audio():
             }), 400
         
         youtube_url = data['youtube_url']
+        extractor = get_extractor()
         
         # Extract audio
-        audio_file = extractor.extract_audio_from_youtube(youtube_url)
+        audio_file = extractor.extract_audio_from_youtube(youtube_url, cancel_token=g.cancel_token)
         if not audio_file:
             return jsonify({
                 'error': 'Failed to extract audio from YouTube URL'
@@ -72,32 +189,40 @@ def extract_audio():
             }), 500
         
         # Simple pitch estimation
-        pitch_estimates = extractor.simulate_pitch_estimation(audio_file)
+        pitch_estimates = extractor.simulate_pitch_estimation(audio_file, cancel_token=g.cancel_token)
+        result_id = get_result_store().save(pitch_estimates, source=youtube_url)
         
         # Prepare response
         response = {
             'success': True,
             'audio_file': audio_file,
             'analysis': analysis,
+            'result_id': result_id,
             'pitch_estimates': pitch_estimates,
             'timestamp': datetime.now().isoformat()
         }
+        if not data.get('include_estimates', True):
+            del response['pitch_estimates']
         
         return jsonify(response)
         
+    except OperationCancelled:
+        raise
     except Exception as e:
         return jsonify({
             'error': f'Internal server error: {str(e)}'
         }), 500
 
 @app.route('/analyze-audio', methods=['POST'])
+@deadline(REQUEST_TIMEOUT)
 def analyze_audio():
     """
     Analyze an existing audio file.
     
     Expected JSON payload:
     {
-        "audio_file_path": "/path/to/audio/file.wav"
+        "audio_file_path": "/path/to/audio/file.wav",
+        "include_estimates": true  (optional; false returns only result_id)
     }
     """
     try:
@@ -114,6 +239,8 @@ def analyze_audio():
                 'error': f'Audio file not found: {audio_file_path}'
             }), 404
         
+        extractor = get_extractor()
+        
         # Basic analysis
         analysis = extractor.get_audio_info(audio_file_path)
         if not analysis:
@@ -122,28 +249,99 @@ def analyze_audio():
             }), 500
         
         # Simple pitch estimation
-        pitch_estimates = extractor.simulate_pitch_estimation(audio_file_path)
+        pitch_estimates = extractor.simulate_pitch_estimation(audio_file_path, cancel_token=g.cancel_token)
+        result_id = get_result_store().save(pitch_estimates, source=audio_file_path)
         
         # Prepare response
         response = {
             'success': True,
             'analysis': analysis,
+            'result_id': result_id,
             'pitch_estimates': pitch_estimates,
             'timestamp': datetime.now().isoformat()
         }
+        if not data.get('include_estimates', True):
+            del response['pitch_estimates']
         
         return jsonify(response)
         
+    except OperationCancelled:
+        raise
     except Exception as e:
         return jsonify({
             'error': f'Internal server error: {str(e)}'
         }), 500
 
+def build_tab(pitch_estimates):
+    """
+    Collapse frame-level estimates into note events and lay them out as a
+    tab spaced by rhythm, so tab and page size follow the number of notes.
+    """
+    from note_segmentation import segment_notes, rhythm_unit
+    notes = segment_notes(pitch_estimates)
+    tab = generate_tab(notes, notes_per_measure=8, measures_per_line=4, column_duration=rhythm_unit(notes))
+    return notes, tab
+
+def parse_time_range():
+    """Read optional start/end (seconds) query parameters."""
+    start = request.args.get('start', type=float)
+    end = request.args.get('end', type=float)
+    if start is not None and end is not None and end < start:
+        raise ValueError('end must not be before start')
+    return start, end
+
+@app.route('/results/<result_id>', methods=['GET'])
+def get_result(result_id):
+    """
+    Stored pitch estimates, paginated and filtered by time.
+    
+    Query parameters:
+        start, end: Only estimates overlapping [start, end) seconds
+        offset: Number of matching estimates to skip (default 0)
+        limit: Page size (default 500, max 5000)
+    """
+    try:
+        start, end = parse_time_range()
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = min(max(1, request.args.get('limit', 500, type=int)), 5000)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        page = get_result_store().query(result_id, start=start, end=end, offset=offset, limit=limit)
+        return jsonify(page)
+    except KeyError:
+        return jsonify({'error': f'Result not found: {result_id}'}), 404
+
+@app.route('/results/<result_id>/notes.npz', methods=['GET'])
+def get_result_npz(result_id):
+    """Stored pitch estimates as a packed NumPy .npz file."""
+    try:
+        path = get_result_store().npz_path(result_id)
+    except KeyError:
+        return jsonify({'error': f'Result not found: {result_id}'}), 404
+    return send_file(path, mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f'{result_id}.npz')
+
+@app.route('/results/<result_id>/notes.mid', methods=['GET'])
+def get_result_midi(result_id):
+    """Stored pitch estimates as a Standard MIDI File, optionally for start/end only."""
+    try:
+        start, end = parse_time_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        midi = get_result_store().midi(result_id, start=start, end=end)
+    except KeyError:
+        return jsonify({'error': f'Result not found: {result_id}'}), 404
+    return Response(midi, mimetype='audio/midi',
+                    headers={'Content-Disposition': f'attachment; filename={result_id}.mid'})
+
 @app.route('/cleanup', methods=['POST'])
 def cleanup():
     """Clean up temporary files."""
     try:
-        extractor.cleanup()
+        get_extractor().cleanup()
+        get_result_store().clear()
         return jsonify({
             'success': True,
             'message': 'Temporary files cleaned up',
@@ -170,41 +368,8 @@ def internal_error(error):
 def index():
     return render_template('index.html')
 
-def timeout_handler(signum, frame):
-    raise TimeoutError("Operation timed out")
-
-def timeout(seconds):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            def target():
-                return func(*args, **kwargs)
-            
-            result = [None]
-            exception = [None]
-            
-            def worker():
-                try:
-                    result[0] = target()
-                except Exception as e:
-                    exception[0] = e
-            
-            thread = threading.Thread(target=worker)
-            thread.daemon = True
-            thread.start()
-            thread.join(seconds)
-            
-            if thread.is_alive():
-                raise TimeoutError(f"Operation timed out after {seconds} seconds")
-            
-            if exception[0]:
-                raise exception[0]
-            
-            return result[0]
-        return wrapper
-    return decorator
-
 @app.route('/extract', methods=['POST'])
+@deadline(REQUEST_TIMEOUT, on_cancel=web_cancelled_response, on_busy=web_busy_response)
 def web_extract_audio():
     youtube_url = request.form.get('youtube_url')
     if not youtube_url:
@@ -213,23 +378,28 @@ def web_extract_audio():
     
     print(f"Processing YouTube URL: {youtube_url}")
     try:
-        audio_file = extractor.extract_audio_from_youtube(youtube_url)
+        extractor = get_extractor()
+        audio_file = extractor.extract_audio_from_youtube(youtube_url, cancel_token=g.cancel_token)
         if not audio_file:
             raise Exception('Failed to extract audio from YouTube URL')
         print("Analyzing audio...")
         analysis = extractor.get_audio_info(audio_file)
         print("Generating pitch estimates...")
-        pitch_estimates = extractor.simulate_pitch_estimation(audio_file)
+        pitch_estimates = extractor.simulate_pitch_estimation(audio_file, cancel_token=g.cancel_token)
         print("Generating full sheet tab...")
         # Generate full sheet tab with measures and line breaks
-        tab = generate_tab(pitch_estimates, notes_per_measure=8, measures_per_line=4)
+        notes, tab = build_tab(pitch_estimates)
+        print(f"Collapsed {len(pitch_estimates)} estimates into {len(notes)} notes")
         print("Processing complete!")
-        return render_template('results.html', audio_file=audio_file, analysis=analysis, pitch_estimates=pitch_estimates, tab=tab)
+        return render_template('results.html', audio_file=audio_file, analysis=analysis, pitch_estimates=notes, tab=tab)
+    except OperationCancelled:
+        raise
     except Exception as e:
         flash(f'Error processing YouTube video: {str(e)}', 'error')
         return redirect(url_for('index'))
 
 @app.route('/analyze', methods=['POST'])
+@deadline(REQUEST_TIMEOUT, on_cancel=web_cancelled_response, on_busy=web_busy_response)
 def web_analyze_audio():
     if 'audio_file' not in request.files:
         flash('No file part.', 'error')
@@ -241,18 +411,22 @@ def web_analyze_audio():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         file.save(file_path)
+        g.cancel_token.track_file(file_path)
         
         print(f"Analyzing uploaded file: {filename}")
+        extractor = get_extractor()
         analysis = extractor.get_audio_info(file_path)
         print("Generating pitch estimates...")
-        pitch_estimates = extractor.simulate_pitch_estimation(file_path)
+        pitch_estimates = extractor.simulate_pitch_estimation(file_path, cancel_token=g.cancel_token)
         print("Generating full sheet tab...")
         # Generate full sheet tab with measures and line breaks
-        tab = generate_tab(pitch_estimates, notes_per_measure=8, measures_per_line=4)
+        notes, tab = build_tab(pitch_estimates)
+        print(f"Collapsed {len(pitch_estimates)} estimates into {len(notes)} notes")
         print("Processing complete!")
         
-        return render_template('results.html', audio_file=file_path, analysis=analysis, pitch_estimates=pitch_estimates, tab=tab)
+        return render_template('results.html', audio_file=file_path, analysis=analysis, pitch_estimates=notes, tab=tab)
     else:
         flash('Invalid file type.', 'error')
         return redirect(url_for('index'))
@@ -262,8 +436,12 @@ if __name__ == '__main__':
     print("Starting Audio Processor Service...")
     print("Available endpoints:")
     print("  GET  /health - Health check")
+    print("  GET  /metrics - Job outcome counters")
     print("  POST /extract-audio - Extract and analyze audio from YouTube")
     print("  POST /analyze-audio - Analyze existing audio file")
+    print("  GET  /results/<id> - Stored pitch estimates (start/end/offset/limit)")
+    print("  GET  /results/<id>/notes.npz - Stored pitch estimates as packed .npz")
+    print("  GET  /results/<id>/notes.mid - Stored pitch estimates as MIDI")
     print("  POST /cleanup - Clean up temporary files")
     
     app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
@@ -7,12 +7,25 @@ import yt_dlp
 from pydub import AudioSegment
 import numpy as np
 
+from pitch_analysis import estimate_segment_pitches
+from parallel_analysis import sharded_pitch_estimation
+from pcm_cache import PCMCache
+from result_store import ResultStore
+from cancellation import CancellationToken, OperationCancelled, check_cancelled, yt_dlp_progress_hook
+
+SHARD_DURATION = 60.0  # seconds of audio owned by each parallel analysis shard
+
 class AudioExtractor:
-    def __init__(self, output_dir: str = "temp_audio"):
+    def __init__(self, output_dir: str = "temp_audio", analysis_sample_rate: Optional[int] = None):
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
+        # Decoded PCM is cached next to the source so re-analysis skips ffmpeg.
+        # It lives in a subdirectory, which cleanup() keeps.
+        self.analysis_sample_rate = analysis_sample_rate
+        self.pcm_cache = PCMCache(os.path.join(output_dir, 'pcm_cache'))
     
-    def extract_audio_from_youtube(self, youtube_url: str) -> Optional[str]:
+    def extract_audio_from_youtube(self, youtube_url: str,
+                                   cancel_token: Optional[CancellationToken] = None) -> Optional[str]:
         try:
             ydl_opts = {
                 'format': 'bestaudio/best',
@@ -25,6 +38,8 @@ class AudioExtractor:
                 'quiet': True,
                 'no_warnings': True
             }
+            if cancel_token is not None:
+                ydl_opts['progress_hooks'] = [yt_dlp_progress_hook(cancel_token)]
             
             print(f"Extracting audio from: {youtube_url}")
             
@@ -33,7 +48,9 @@ class AudioExtractor:
                 video_title = info.get('title', 'unknown')
                 print(f"Video title: {video_title}")
                 
+                check_cancelled(cancel_token)
                 ydl.download([youtube_url])
+                check_cancelled(cancel_token)
                 
                 expected_filename = f"{video_title}.wav"
                 file_path = os.path.join(self.output_dir, expected_filename)
@@ -45,7 +62,11 @@ class AudioExtractor:
                     print("Audio file not found after extraction")
                     return None
                     
+        except OperationCancelled:
+            raise
         except Exception as e:
+            if cancel_token is not None and cancel_token.cancelled:
+                cancel_token.check()
             print(f"Error extracting audio: {str(e)}")
             return None
     
@@ -84,47 +105,82 @@ class AudioExtractor:
             print(f"Error analyzing audio: {str(e)}")
             return {}
     
-    def simple_pitch_estimation(self, audio_file_path: str, segment_duration: float = 1.0) -> List[Dict]:
+    def _load_mono_samples(self, audio_file_path: str,
+                           cancel_token: Optional[CancellationToken] = None) -> Tuple[np.ndarray, int]:
+        return self.pcm_cache.load(audio_file_path, self.analysis_sample_rate, cancel_token)
+    
+    def simple_pitch_estimation(self, audio_file_path: str, segment_duration: float = 1.0,
+                                cancel_token: Optional[CancellationToken] = None,
+                                workers: Optional[int] = 1) -> List[Dict]:
+        """
+        Estimate the dominant pitch of each segment of an audio file.
+        
+        Args:
+            audio_file_path: Path to the audio file
+            segment_duration: Duration of each analysis segment in seconds
+            cancel_token: Optional token checked while decoding and analyzing
+            workers: Worker processes for tracks longer than one shard
+                (None: one per CPU, 1: always analyze in this process)
+            
+        Returns:
+            List of pitch estimates
+        """
         try:
-            audio = AudioSegment.from_wav(audio_file_path)
-            sample_rate = audio.frame_rate
-            samples = np.array(audio.get_array_of_samples())
+            samples, sample_rate = self._load_mono_samples(audio_file_path, cancel_token)
             
-            if audio.channels == 2:
-                samples = samples.reshape(-1, 2).mean(axis=1)
+            if workers != 1 and len(samples) > SHARD_DURATION * sample_rate:
+                return self.sharded_pitch_estimation(audio_file_path, segment_duration, workers=workers,
+                                                     cancel_token=cancel_token)
             
             segment_length = int(segment_duration * sample_rate)
-            pitch_estimates = []
-            
-            for i in range(0, len(samples), segment_length):
-                segment = samples[i:i + segment_length]
-                if len(segment) < segment_length:
-                    break
-                
-                fft = np.fft.fft(segment)
-                freqs = np.fft.fftfreq(len(segment), 1/sample_rate)
-                
-                magnitude_spectrum = np.abs(fft)
-                peak_idx = np.argmax(magnitude_spectrum[1:len(magnitude_spectrum)//2]) + 1
-                peak_frequency = abs(freqs[peak_idx])
-                
-                if peak_frequency > 80:  # Hz
-                    pitch_estimates.append({
-                        'start_time': i / sample_rate,
-                        'end_time': (i + segment_length) / sample_rate,
-                        'estimated_frequency': peak_frequency,
-                        'confidence': magnitude_spectrum[peak_idx] / np.max(magnitude_spectrum)
-                    })
+            pitch_estimates = estimate_segment_pitches(samples, sample_rate, segment_length,
+                                                       cancel_token=cancel_token)
             
             print(f"Pitch estimation completed: {len(pitch_estimates)} segments analyzed")
             return pitch_estimates
             
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            print(f"Error in pitch estimation: {str(e)}")
+            return []
+    
+    def sharded_pitch_estimation(self, audio_file_path: str, segment_duration: float = 1.0,
+                                 workers: Optional[int] = None, shard_duration: float = SHARD_DURATION,
+                                 cancel_token: Optional[CancellationToken] = None) -> List[Dict]:
+        """
+        Same as simple_pitch_estimation, but splits the track into overlapping
+        shards and analyzes them in parallel worker processes.
+        
+        Args:
+            audio_file_path: Path to the audio file
+            segment_duration: Duration of each analysis segment in seconds
+            workers: Number of worker processes (default: one per CPU)
+            shard_duration: Duration of audio owned by each shard in seconds
+            cancel_token: Optional token checked while decoding and analyzing
+            
+        Returns:
+            List of pitch estimates, identical to simple_pitch_estimation
+        """
+        try:
+            descriptor, sample_rate = self.pcm_cache.descriptor(audio_file_path, self.analysis_sample_rate,
+                                                                cancel_token)
+            
+            pitch_estimates = sharded_pitch_estimation(descriptor, sample_rate, segment_duration,
+                                                       workers=workers, shard_duration=shard_duration,
+                                                       cancel_token=cancel_token)
+            
+            print(f"Sharded pitch estimation completed: {len(pitch_estimates)} segments analyzed")
+            return pitch_estimates
+            
+        except OperationCancelled:
+            raise
         except Exception as e:
             print(f"Error in pitch estimation: {str(e)}")
             return []
     
     def cleanup(self):
-        """Clean up temporary files."""
+        """Clean up temporary files. Subdirectories such as the PCM cache are kept."""
         try:
             for file in os.listdir(self.output_dir):
                 file_path = os.path.join(self.output_dir, file)
@@ -154,7 +210,8 @@ def main():
             print("Failed to analyze audio")
             return
         
-        pitch_estimates = extractor.simple_pitch_estimation(audio_file)
+        # Long tracks are split into shards analyzed on every core
+        pitch_estimates = extractor.simple_pitch_estimation(audio_file, workers=None)
         
         results = {
             'audio_analysis': analysis,
@@ -163,9 +220,14 @@ def main():
         
         output_file = os.path.join(extractor.output_dir, 'analysis_results.json')
         with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
+            json.dump(results, f, separators=(',', ':'))
+        
+        store = ResultStore(os.path.join(extractor.output_dir, 'results'))
+        result_id = store.save(pitch_estimates, source=youtube_url)
         
         print(f"\nResults saved to: {output_file}")
+        print(f"Packed results: {store.npz_path(result_id)}")
+        print(f"MIDI file: {store.export_midi(result_id)}")
         print(f"Found {len(pitch_estimates)} pitch estimates")
         
         if pitch_estimates:
@@ -3,19 +3,31 @@ import os
 import sys
 import tempfile
 import json
-from typing import Dict, List, Optional, Tuple
-import yt_dlp
-import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cancellation import CancellationToken, OperationCancelled, check_cancelled, yt_dlp_progress_hook
+
+# yt_dlp and numpy are imported where they are used so that importing this
+# module (and app.py) stays cheap until a request actually needs them.
 
 class SimpleAudioExtractor:
     """Handles YouTube audio extraction and basic pitch analysis."""
     
-    def __init__(self, output_dir: str = "temp_audio"):
+    def __init__(self, output_dir: str = "temp_audio",
+                 downloader: Optional[Callable[..., Optional[str]]] = None):
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
+        # Replaces the yt-dlp download, e.g. with stub_downloader.StubDownloader
+        # for offline load tests. Called as downloader(url, output_dir, cancel_token).
+        self.downloader = downloader
     
-    def extract_audio_from_youtube(self, youtube_url: str) -> Optional[str]:
+    def extract_audio_from_youtube(self, youtube_url: str,
+                                   cancel_token: Optional[CancellationToken] = None) -> Optional[str]:
+        if self.downloader is not None:
+            return self.downloader(youtube_url, self.output_dir, cancel_token)
         try:
+            import yt_dlp
+            
             ydl_opts = {
                 'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio',
                 'outtmpl': os.path.join(self.output_dir, '%(title)s.%(ext)s'),
@@ -30,6 +42,9 @@ class SimpleAudioExtractor:
                 'max_filesize': 100 * 1024 * 1024,
                 'max_duration': 600,
             }
+            if cancel_token is not None:
+                # Called for every downloaded chunk; raising here aborts the download
+                ydl_opts['progress_hooks'] = [yt_dlp_progress_hook(cancel_token)]
             
             print(f"Extracting audio from: {youtube_url}")
             
@@ -46,8 +61,10 @@ class SimpleAudioExtractor:
                 print(f"Video title: {video_title}")
                 print(f"Duration: {duration}s")
                 
+                check_cancelled(cancel_token)
                 print("Downloading audio...")
                 ydl.download([youtube_url])
+                check_cancelled(cancel_token)
                 
                 possible_extensions = ['m4a', 'webm', 'mp3', 'wav', 'ogg']
                 file_path = None
@@ -69,7 +86,12 @@ class SimpleAudioExtractor:
                         print(f"  - {file}")
                     return None
                     
+        except OperationCancelled:
+            raise
         except Exception as e:
+            if cancel_token is not None and cancel_token.cancelled:
+                # yt-dlp may wrap the exception raised by the progress hook
+                cancel_token.check()
             print(f"Error extracting audio: {str(e)}")
             if "Video unavailable" in str(e):
                 print("This video is not available for download")
@@ -137,7 +159,8 @@ class SimpleAudioExtractor:
             print(f"Error analyzing audio file: {str(e)}")
             return {}
     
-    def simulate_pitch_estimation(self, audio_file_path: str, segment_duration: float = 5.0) -> List[Dict]:
+    def simulate_pitch_estimation(self, audio_file_path: str, segment_duration: float = 5.0,
+                                  cancel_token: Optional[CancellationToken] = None) -> List[Dict]:
         """
         Simulate pitch estimation for demonstration purposes.
         In a real implementation, this would use proper audio analysis libraries.
@@ -145,11 +168,14 @@ class SimpleAudioExtractor:
         Args:
             audio_file_path: Path to the audio file
             segment_duration: Duration of each analysis segment in seconds (default: 5.0 for faster processing)
+            cancel_token: Optional token checked before each segment
             
         Returns:
             List of simulated pitch estimates for each segment
         """
         try:
+            import numpy as np
+            
             file_info = self.get_audio_info(audio_file_path)
             total_duration = file_info.get('estimated_duration_seconds', 60.0)
             
@@ -159,6 +185,7 @@ class SimpleAudioExtractor:
             guitar_frequencies = [82.41, 110.00, 146.83, 196.00, 246.94, 329.63, 440.00, 659.25]
             
             for i in range(num_segments):
+                check_cancelled(cancel_token)
                 start_time = i * segment_duration
                 end_time = (i + 1) * segment_duration
                 
@@ -182,6 +209,8 @@ class SimpleAudioExtractor:
             print(f"Simulated pitch estimation completed: {len(pitch_estimates)} segments")
             return pitch_estimates
             
+        except OperationCancelled:
+            raise
         except Exception as e:
             print(f"Error in pitch estimation: {str(e)}")
             return []
@@ -191,6 +220,8 @@ class SimpleAudioExtractor:
         Convert frequency to approximate note name.
         This is a simplified implementation.
         """
+        import numpy as np
+        
         note_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
         
         if frequency < 80:
@@ -225,6 +256,8 @@ def main():
         print("For full audio analysis, use Python 3.11 with pydub support.")
         sys.exit(1)
     
+    from result_store import ResultStore
+
     youtube_url = sys.argv[1]
     extractor = SimpleAudioExtractor()
     
@@ -249,9 +282,14 @@ def main():
         
         output_file = os.path.join(extractor.output_dir, 'analysis_results.json')
         with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
+            json.dump(results, f, separators=(',', ':'))
+        
+        store = ResultStore(os.path.join(extractor.output_dir, 'results'))
+        result_id = store.save(pitch_estimates, source=youtube_url)
         
         print(f"\nResults saved to: {output_file}")
+        print(f"Packed results: {store.npz_path(result_id)}")
+        print(f"MIDI file: {store.export_midi(result_id)}")
         print(f"Generated {len(pitch_estimates)} simulated pitch estimates")
         
         if pitch_estimates:
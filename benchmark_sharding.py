@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark sharded pitch estimation against the serial loop.
+
+Generates a synthetic guitar-like track, runs the serial estimator once and
+the sharded estimator at increasing worker counts, checks every result is
+identical to the serial one and prints the speedup.
+
+Usage: python benchmark_sharding.py [duration_seconds] [segment_duration]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+from pitch_analysis import estimate_segment_pitches
+from parallel_analysis import sharded_pitch_estimation
+
+
+def make_track(duration: float, sample_rate: int = 44100) -> np.ndarray:
+    """Build a track that steps through open-string frequencies with some noise."""
+    rng = np.random.default_rng(0)
+    guitar_frequencies = [82.41, 110.00, 146.83, 196.00, 246.94, 329.63]
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    freqs = np.take(guitar_frequencies, (t // 0.75).astype(int) % len(guitar_frequencies))
+    tone = np.sin(2 * np.pi * np.cumsum(freqs) / sample_rate)
+    return (tone * 16000 + rng.normal(0, 500, len(t))).astype(np.int16)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 600.0
+    segment_duration = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    sample_rate = 44100
+
+    samples = make_track(duration, sample_rate)
+    segment_length = int(segment_duration * sample_rate)
+    print(f"Track: {duration:.0f}s, segment: {segment_duration}s, CPUs: {os.cpu_count()}")
+
+    start = time.perf_counter()
+    serial = estimate_segment_pitches(samples, sample_rate, segment_length)
+    serial_time = time.perf_counter() - start
+    print(f"  serial      {serial_time:8.3f}s  ({len(serial)} segments)")
+
+    worker_counts = [1, 2, 4, 8, 16, 32, 64]
+    for workers in [w for w in worker_counts if w <= (os.cpu_count() or 1)]:
+        start = time.perf_counter()
+        sharded = sharded_pitch_estimation(samples, sample_rate, segment_duration,
+                                           workers=workers, shard_duration=duration / (workers * 4))
+        elapsed = time.perf_counter() - start
+        status = "identical" if sharded == serial else "MISMATCH"
+        print(f"  {workers:2d} workers  {elapsed:8.3f}s  "
+              f"speedup {serial_time / elapsed:5.2f}x  {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Measure Flask service cold start.
+
+Reports the slowest imports from `python -X importtime -c "import app"` and
+the wall time from launching a fresh interpreter to the first successful
+/health response, with and without the heavy dependencies warmed up.
+
+Usage: python benchmark_startup.py [runs]
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HEALTH_SCRIPT = """
+import app
+{warm}
+client = app.app.test_client()
+assert client.get('/health').status_code == 200
+"""
+
+
+def import_times(top: int = 10):
+    """Return (total_us, [(cumulative_us, module), ...]) for importing app."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=HERE, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.strip()))
+    total = next(cumulative for cumulative, name in rows if name == 'app')
+    return total, sorted(rows, reverse=True)[:top]
+
+
+def time_to_health(warm: bool) -> float:
+    """Seconds from interpreter launch to the first /health response."""
+    script = HEALTH_SCRIPT.format(warm='app.warm_up()' if warm else '')
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', script], cwd=HERE, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    total, slowest = import_times()
+    print(f"import app: {total / 1000:.1f} ms cumulative")
+    print("Slowest imports (cumulative):")
+    for cumulative, name in slowest:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    for warm in (False, True):
+        timings = sorted(time_to_health(warm) for _ in range(runs))
+        label = "with warm_up()" if warm else "lazy imports  "
+        print(f"Cold start to first /health, {label}: "
+              f"median {timings[len(timings) // 2] * 1000:.0f} ms, "
+              f"min {timings[0] * 1000:.0f} ms over {runs} runs")
+
+
+if __name__ == "__main__":
+    main()
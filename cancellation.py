@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Cooperative cancellation and deadlines for audio processing work.
+
+A CancellationToken is passed down to the long-running loops (yt-dlp
+progress hooks, PCM decoding, pitch frame loops), which call check() and
+stop by raising OperationCancelled. Files registered with track_file() are
+removed when the work is cancelled, so abandoned jobs do not leave partial
+downloads behind. WorkMetrics counts how requests ended and bounds the number
+of jobs in flight so an overloaded worker sheds load instead of queueing.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class OperationCancelled(Exception):
+    """Raised by CancellationToken.check() once the work has been cancelled."""
+
+
+class DeadlineExceeded(OperationCancelled, TimeoutError):
+    """Raised by CancellationToken.check() once the deadline has passed."""
+
+
+class CancellationToken:
+    """
+    Cancellation flag with an optional deadline, shared by everything working
+    on one request.
+
+    Args:
+        timeout: Seconds from now until the work is considered timed out
+        deadline: Absolute time.monotonic() deadline, e.g. from another process
+    """
+
+    def __init__(self, timeout: Optional[float] = None, deadline: Optional[float] = None):
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        self.deadline = deadline
+        self.timeout = timeout
+        self._cancelled = threading.Event()
+        self._reason = 'Operation cancelled'
+        self._tracked_files: List[str] = []
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str = 'Operation cancelled'):
+        self._reason = reason
+        self._cancelled.set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or self.expired
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, or None if there is no deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """Raise if the work has been cancelled or its deadline has passed."""
+        if self._cancelled.is_set():
+            raise OperationCancelled(self._reason)
+        if self.expired:
+            if self.timeout is not None:
+                raise DeadlineExceeded(f"Operation timed out after {self.timeout} seconds")
+            raise DeadlineExceeded("Operation deadline exceeded")
+
+    def track_file(self, path: str):
+        """Remember a file that should be deleted if the work is cancelled."""
+        with self._lock:
+            if path not in self._tracked_files:
+                self._tracked_files.append(path)
+
+    def release_files(self):
+        """Delete every tracked file that still exists."""
+        with self._lock:
+            paths, self._tracked_files = self._tracked_files, []
+        for path in paths:
+            try:
+                if os.path.isfile(path):
+                    os.remove(path)
+                    print(f"Removed abandoned file: {path}")
+            except OSError as e:
+                print(f"Error removing {path}: {str(e)}")
+
+
+def check_cancelled(cancel_token: Optional[CancellationToken]):
+    """check() that accepts None, for functions where the token is optional."""
+    if cancel_token is not None:
+        cancel_token.check()
+
+
+def yt_dlp_progress_hook(cancel_token: CancellationToken) -> Callable[[Dict], None]:
+    """
+    Build a yt-dlp progress hook that tracks the files being written and
+    aborts the download once the token is cancelled.
+    """
+    def hook(progress: Dict):
+        for key in ('tmpfilename', 'filename'):
+            if progress.get(key):
+                cancel_token.track_file(progress[key])
+        cancel_token.check()
+    return hook
+
+
+class WorkMetrics:
+    """Thread-safe counters for how jobs ended, plus an in-flight limit."""
+
+    OUTCOMES = ('completed', 'failed', 'cancelled', 'timed_out', 'shed')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.counts = {outcome: 0 for outcome in self.OUTCOMES}
+
+    def try_start(self, max_in_flight: int) -> bool:
+        """Admit a job unless max_in_flight jobs are already running."""
+        with self._lock:
+            if max_in_flight > 0 and self.in_flight >= max_in_flight:
+                self.counts['shed'] += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def finish(self, outcome: str):
+        with self._lock:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {'in_flight': self.in_flight, **self.counts}
@@ -0,0 +1,24 @@
+# Gunicorn configuration for the audio processor service.
+# Usage: gunicorn app:app  (this file is picked up automatically)
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+
+# Load the app once in the master and fork workers from it, so imported
+# modules are shared copy-on-write instead of re-imported by every worker.
+preload_app = True
+
+# app.py defers yt_dlp/numpy until the first request; when preloading, pay
+# that cost once in the master so forked workers start warm.
+warm_imports = os.environ.get('GUNICORN_WARM_IMPORTS', '1') == '1'
+
+
+def when_ready(server):
+    if warm_imports:
+        import app
+        app.warm_up()
+        server.log.info("Heavy imports preloaded in master")
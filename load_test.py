@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the audio processor HTTP endpoints.
+
+Starts the service (gunicorn or the Flask dev server) with the stub
+downloader serving local fixture files, or targets an already running
+server, then drives one endpoint at a fixed concurrency and reports
+requests/sec, latency percentiles, error rates and server RSS over time.
+Files the run creates on the server are removed with POST /cleanup.
+
+Usage:
+    python load_test.py --endpoint extract-audio --concurrency 8 --requests 200
+    python load_test.py --server flask --endpoint analyze --duration 30
+    python load_test.py --url http://localhost:5000 --endpoint health
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ('health', 'extract-audio', 'analyze-audio', 'extract', 'analyze')
+
+
+def write_fixture(path: str, duration: float = 30.0, sample_rate: int = 44100):
+    """Write a mono 16-bit WAV that steps through open-string frequencies."""
+    guitar_frequencies = [82.41, 110.00, 146.83, 196.00, 246.94, 329.63]
+    frames = bytearray()
+    phase = 0.0
+    for i in range(int(duration * sample_rate)):
+        freq = guitar_frequencies[int(i / sample_rate) % len(guitar_frequencies)]
+        phase += 2 * math.pi * freq / sample_rate
+        frames += struct.pack('<h', int(12000 * math.sin(phase)))
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(bytes(frames))
+
+
+def build_request(endpoint: str, fixture: str, n: int) -> Tuple[str, str, bytes, Dict[str, str]]:
+    """Return (method, path, body, headers) for the n-th request."""
+    url = f"https://www.youtube.com/watch?v=load{n % 64:04d}"
+    if endpoint == 'health':
+        return 'GET', '/health', b'', {}
+    if endpoint == 'extract-audio':
+        body = json.dumps({'youtube_url': url}).encode()
+        return 'POST', '/extract-audio', body, {'Content-Type': 'application/json'}
+    if endpoint == 'analyze-audio':
+        body = json.dumps({'audio_file_path': os.path.abspath(fixture)}).encode()
+        return 'POST', '/analyze-audio', body, {'Content-Type': 'application/json'}
+    if endpoint == 'extract':
+        body = f"youtube_url={url}".encode()
+        return 'POST', '/extract', body, {'Content-Type': 'application/x-www-form-urlencoded'}
+    if endpoint == 'analyze':
+        boundary = uuid.uuid4().hex
+        with open(fixture, 'rb') as f:
+            data = f.read()
+        body = (f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="audio_file"; filename="load_{n}.wav"\r\n'
+                f"Content-Type: audio/wav\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        return 'POST', '/analyze', body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def is_success(status: int) -> bool:
+    # Redirects count as errors: the HTML endpoints report failures by
+    # flashing a message and redirecting to /
+    return status == 200
+
+
+def send(host: str, port: int, request: Tuple[str, str, bytes, Dict[str, str]],
+         timeout: float) -> Tuple[float, int]:
+    """Send one request without following redirects; returns (seconds, status)."""
+    method, path, body, headers = request
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request(method, path, body=body or None, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        status = response.status
+    except (OSError, http.client.HTTPException):
+        status = 0  # connection error or client-side timeout
+    finally:
+        conn.close()
+    return time.perf_counter() - start, status
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """Total RSS in bytes of pid and its descendants (Linux /proc only)."""
+    if not os.path.isdir('/proc'):
+        return None
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; ppid follows the closing paren
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class RSSSampler(threading.Thread):
+    """Samples the server's process-tree RSS at a fixed interval."""
+
+    def __init__(self, pid: int, interval: float):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Tuple[float, int]] = []
+        self._stop_event = threading.Event()
+        self._start = time.perf_counter()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = process_tree_rss(self.pid)
+            if rss is not None:
+                self.samples.append((time.perf_counter() - self._start, rss))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind: str, port: int, env: Dict[str, str], workers: int) -> subprocess.Popen:
+    if kind == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers)]
+    else:
+        cmd = [sys.executable, '-c',
+               f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    return subprocess.Popen(cmd, cwd=HERE, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_for_health(host: str, port: int, timeout: float = 30.0) -> float:
+    """Poll /health until it answers; returns seconds waited."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        _, status = send(host, port, ('GET', '/health', b'', {}), timeout=1.0)
+        if status == 200:
+            return time.perf_counter() - start
+        time.sleep(0.05)
+    raise RuntimeError(f"Server did not become healthy within {timeout}s")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_load(host: str, port: int, endpoint: str, fixture: str, concurrency: int,
+             total_requests: Optional[int], duration: Optional[float],
+             timeout: float) -> Tuple[List[Tuple[float, int]], float]:
+    results: List[Tuple[float, int]] = []
+    lock = threading.Lock()
+    counter = iter(range(total_requests if total_requests else sys.maxsize))
+    stop_at = time.perf_counter() + duration if duration else None
+
+    def worker():
+        while True:
+            if stop_at is not None and time.perf_counter() >= stop_at:
+                return
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            result = send(host, port, build_request(endpoint, fixture, n), timeout)
+            with lock:
+                results.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return results, time.perf_counter() - start
+
+
+def report(endpoint: str, concurrency: int, results: List[Tuple[float, int]], elapsed: float,
+           rss_samples: List[Tuple[float, int]]) -> Dict:
+    latencies = sorted(latency for latency, _ in results)
+    statuses: Dict[str, int] = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for _, status in results if not is_success(status))
+
+    summary = {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': len(results),
+        'elapsed_seconds': elapsed,
+        'requests_per_second': len(results) / elapsed if elapsed else 0.0,
+        'error_rate': errors / len(results) if results else 0.0,
+        'status_counts': statuses,
+        'latency_ms': {
+            name: percentile(latencies, pct) * 1000
+            for name, pct in (('p50', 50), ('p90', 90), ('p95', 95), ('p99', 99), ('max', 100))
+        },
+        'rss_mb': [(round(t, 2), round(rss / (1024 * 1024), 1)) for t, rss in rss_samples],
+    }
+
+    print(f"\n{endpoint} at concurrency {concurrency}: {len(results)} requests in {elapsed:.2f}s")
+    print(f"  Throughput: {summary['requests_per_second']:.1f} req/s")
+    print(f"  Error rate: {summary['error_rate'] * 100:.1f}%  statuses: {statuses}")
+    print("  Latency:    " + "  ".join(f"{name} {value:.0f}ms"
+                                       for name, value in summary['latency_ms'].items()))
+    if rss_samples:
+        peak = max(rss for _, rss in rss_samples) / (1024 * 1024)
+        print(f"  Server RSS: start {rss_samples[0][1] / (1024 * 1024):.1f}MB, "
+              f"end {rss_samples[-1][1] / (1024 * 1024):.1f}MB, peak {peak:.1f}MB")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--endpoint', choices=ENDPOINTS, default='extract-audio')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100, help='total requests (ignored with --duration)')
+    parser.add_argument('--duration', type=float, help='run for this many seconds instead')
+    parser.add_argument('--timeout', type=float, default=60.0, help='client timeout per request')
+    parser.add_argument('--url', help='target an already running server instead of starting one')
+    parser.add_argument('--server', choices=('gunicorn', 'flask'), default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--fixtures', help='directory of fixture audio (default: generated WAV)')
+    parser.add_argument('--latency', type=float, default=0.5, help='stub download latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random stub latency in seconds')
+    parser.add_argument('--rss-interval', type=float, default=0.5)
+    parser.add_argument('--json', help='also write the summary to this file')
+    parser.add_argument('--cleanup', action='store_true',
+                        help='POST /cleanup after the run (always done for a server this script starts)')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='load_test_')
+    fixtures_dir = args.fixtures
+    if not fixtures_dir:
+        fixtures_dir = os.path.join(scratch, 'fixtures')
+        os.makedirs(fixtures_dir)
+        write_fixture(os.path.join(fixtures_dir, 'fixture.wav'))
+    fixture = next(os.path.join(fixtures_dir, name) for name in sorted(os.listdir(fixtures_dir)))
+
+    server = None
+    sampler = None
+    try:
+        if args.url:
+            parsed = urlparse(args.url)
+            host, port = parsed.hostname, parsed.port or 80
+        else:
+            host, port = '127.0.0.1', free_port()
+            env = dict(os.environ,
+                       AUDIO_STUB_FIXTURES=fixtures_dir,
+                       AUDIO_STUB_LATENCY=str(args.latency),
+                       AUDIO_STUB_JITTER=str(args.jitter))
+            server = start_server(args.server, port, env, args.workers)
+            print(f"Started {args.server} on port {port}, "
+                  f"healthy after {wait_for_health(host, port):.2f}s")
+            sampler = RSSSampler(server.pid, args.rss_interval)
+            sampler.start()
+
+        results, elapsed = run_load(host, port, args.endpoint, fixture, args.concurrency,
+                                    None if args.duration else args.requests,
+                                    args.duration, args.timeout)
+        if sampler:
+            sampler.stop()
+        if server or args.cleanup:
+            # Remove the downloads, uploads and results the run left behind
+            _, status = send(host, port, ('POST', '/cleanup', b'', {}), args.timeout)
+            if status != 200:
+                print(f"Warning: POST /cleanup returned {status}")
+        summary = report(args.endpoint, args.concurrency, results, elapsed,
+                         sampler.samples if sampler else [])
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(summary, f, indent=2)
+    finally:
+        if server:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
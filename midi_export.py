@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Standard MIDI File export of transcription results.
+
+Writes a single-track (format 0) SMF with one note per note event (see
+note_segmentation.segment_notes), using the event's start/end times and
+confidence as velocity.
+"""
+
+import math
+import struct
+from typing import Dict, List, Optional
+
+GUITAR_PROGRAM = 25  # General MIDI "Acoustic Guitar (steel)", zero-based
+
+
+def frequency_to_midi(frequency: float) -> Optional[int]:
+    """Nearest MIDI note number for a frequency, or None if out of range."""
+    if not frequency or frequency <= 0:
+        return None
+    midi = int(round(12 * math.log2(frequency / 440.0) + 69))
+    return midi if 0 <= midi <= 127 else None
+
+
+def _variable_length(value: int) -> bytes:
+    """Encode a delta time as a MIDI variable-length quantity."""
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def estimates_to_midi(pitch_estimates: List[Dict], tempo_bpm: float = 120.0,
+                      ticks_per_beat: int = 480, program: int = GUITAR_PROGRAM) -> bytes:
+    """
+    Convert pitch estimates to a Standard MIDI File.
+
+    Args:
+        pitch_estimates: Note events (or estimates) with start_time, end_time
+            and either midi or estimated_frequency, optionally confidence (0-1).
+            Frame-rate estimates should go through segment_notes first, or
+            every frame becomes its own re-struck note.
+        tempo_bpm: Tempo written to the file; times are converted at this tempo
+        ticks_per_beat: MIDI time resolution
+        program: General MIDI program number (zero-based)
+
+    Returns:
+        The MIDI file contents
+    """
+    ticks_per_second = ticks_per_beat * tempo_bpm / 60.0
+    events = []  # (tick, order, bytes); note-offs sort before note-ons at the same tick
+    for est in pitch_estimates:
+        midi = est.get('midi')
+        if midi is None:
+            midi = frequency_to_midi(est.get('estimated_frequency', 0))
+        if midi is None or not 0 <= midi <= 127:
+            continue
+        midi = int(midi)
+        velocity = max(1, min(127, int(round(est.get('confidence', 0.8) * 127))))
+        start = int(round(est['start_time'] * ticks_per_second))
+        end = max(start + 1, int(round(est['end_time'] * ticks_per_second)))
+        events.append((start, 1, bytes([0x90, midi, velocity])))
+        events.append((end, 0, bytes([0x80, midi, 0])))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    track = bytearray()
+    tempo = int(round(60_000_000 / tempo_bpm))
+    track += b'\x00\xff\x51\x03' + tempo.to_bytes(3, 'big')
+    track += b'\x00' + bytes([0xC0, program & 0x7F])
+    last_tick = 0
+    for tick, _, message in events:
+        track += _variable_length(tick - last_tick) + message
+        last_tick = tick
+    track += b'\x00\xff\x2f\x00'  # end of track
+
+    header = b'MThd' + struct.pack('>IHHH', 6, 0, 1, ticks_per_beat)
+    return header + b'MTrk' + struct.pack('>I', len(track)) + bytes(track)
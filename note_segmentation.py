@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Frame-to-note segmentation.
+
+A frame-rate pitch tracker reports the same sustained note hundreds of
+times. segment_notes() collapses frame-level pitch estimates into note
+events with durations:
+
+1. median smoothing of the MIDI pitch track,
+2. hysteresis on confidence (separate on/off thresholds) to decide which
+   frames are voiced,
+3. hysteresis on MIDI value, so vibrato or a wobble around a semitone
+   boundary does not split a note,
+4. dropping notes shorter than a minimum length.
+
+The heavy per-frame work is vectorized with numpy; Python loops only run
+over pitch runs and notes, whose count is far smaller than the frame count.
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+
+def midi_to_note_name(midi: int) -> str:
+    # e.g. 69 -> 'A4', matching tab_generator.note_name_to_midi
+    return f"{NOTE_NAMES[midi % 12]}{midi // 12 - 1}"
+
+
+def _median_filter(values: np.ndarray, window: int) -> np.ndarray:
+    """Centered running median that ignores NaNs and repeats edge values."""
+    if window <= 1 or len(values) < 2:
+        return values.copy()
+    half = window // 2
+    padded = np.pad(values, half, mode='edge')
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    all_nan = np.isnan(windows).all(axis=1)
+    smoothed = np.full(len(values), np.nan)
+    if (~all_nan).any():
+        smoothed[~all_nan] = np.nanmedian(windows[~all_nan], axis=1)
+    return smoothed
+
+
+def _confidence_hysteresis(confidence: np.ndarray, on: float, off: float) -> np.ndarray:
+    """Voiced once confidence reaches `on`, unvoiced once it drops below `off`."""
+    state = np.where(confidence >= on, 1, np.where(confidence < off, 0, -1))
+    # Frames between the thresholds inherit the most recent decided state
+    last_decided = np.where(state >= 0, np.arange(len(state)), -1)
+    last_decided = np.maximum.accumulate(last_decided)
+    return np.where(last_decided >= 0, state[np.maximum(last_decided, 0)], 0).astype(bool)
+
+
+def _pitch_hysteresis(smoothed_midi: np.ndarray, voiced: np.ndarray, hysteresis: float) -> np.ndarray:
+    """
+    Quantize the pitch track to MIDI notes, holding the current note until
+    the pitch moves more than 0.5 + hysteresis semitones away from it.
+    """
+    notes = np.full(len(smoothed_midi), -1, dtype=np.int64)
+    candidate = np.where(voiced, np.round(np.nan_to_num(smoothed_midi, nan=-1.0)), -1).astype(np.int64)
+    if not len(candidate):
+        return notes
+
+    # Work run by run: a run is a stretch of frames with the same rounded note
+    run_starts = np.flatnonzero(np.diff(candidate, prepend=candidate[0] - 1))
+    run_ends = np.append(run_starts[1:], len(candidate))
+    held = -1
+    for start, end in zip(run_starts, run_ends):
+        if candidate[start] < 0:
+            held = -1
+            continue
+        if held < 0 or np.abs(smoothed_midi[start:end] - held).max() > 0.5 + hysteresis:
+            held = int(candidate[start])
+        notes[start:end] = held
+    return notes
+
+
+def segment_notes(pitch_estimates: List[Dict], median_window: float = 0.05,
+                  confidence_on: float = 0.5, confidence_off: float = 0.3,
+                  pitch_hysteresis: float = 0.25, min_note_duration: float = 0.06,
+                  max_gap: Optional[float] = None) -> List[Dict]:
+    """
+    Collapse frame-level pitch estimates into note events.
+
+    Args:
+        pitch_estimates: Frame or segment estimates with start_time, end_time,
+            estimated_frequency and confidence
+        median_window: Width of the median pitch smoothing in seconds
+        confidence_on: Confidence at which a note may start
+        confidence_off: Confidence below which a note ends
+        pitch_hysteresis: Extra semitones beyond 0.5 the pitch must move
+            before a new note starts
+        min_note_duration: Notes shorter than this (seconds) are dropped
+        max_gap: Largest gap between frames still treated as one note
+            (default: half a frame hop)
+
+    Returns:
+        List of note events with start_time, end_time, duration, midi, note,
+        estimated_frequency, confidence and frames
+    """
+    if not pitch_estimates:
+        return []
+
+    estimates = sorted(pitch_estimates, key=lambda est: est['start_time'])
+    start_times = np.array([est['start_time'] for est in estimates], dtype=np.float64)
+    end_times = np.array([est['end_time'] for est in estimates], dtype=np.float64)
+    frequencies = np.array([est.get('estimated_frequency', 0.0) for est in estimates], dtype=np.float64)
+    confidence = np.array([est.get('confidence', 1.0) for est in estimates], dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        midi = np.where(frequencies > 0, 12 * np.log2(frequencies / 440.0) + 69, np.nan)
+
+    hop = float(np.median(np.diff(start_times))) if len(start_times) > 1 else float(end_times[0] - start_times[0])
+    window = max(1, int(round(median_window / hop))) if hop > 0 else 1
+    window += 1 - window % 2  # odd, so the median is centered
+    smoothed = _median_filter(midi, window)
+
+    voiced = _confidence_hysteresis(confidence, confidence_on, confidence_off) & ~np.isnan(smoothed)
+    notes = _pitch_hysteresis(smoothed, voiced, pitch_hysteresis)
+
+    # A note ends where the held pitch changes or the frames stop touching
+    if max_gap is None:
+        max_gap = hop / 2
+    gaps = start_times[1:] - end_times[:-1] > max_gap
+    boundaries = np.flatnonzero((np.diff(notes) != 0) | gaps) + 1
+    seg_starts = np.concatenate(([0], boundaries))
+    seg_ends = np.concatenate((boundaries, [len(notes)]))
+
+    events = []
+    # True while everything since the last event was voiced frames dropped as
+    # too-short blips; a rest or a time gap means the next note is re-struck
+    bridgeable = False
+    for start, end in zip(seg_starts, seg_ends):
+        note = int(notes[start])
+        if start > 0 and gaps[start - 1]:
+            bridgeable = False
+        if note < 0:
+            bridgeable = False
+            continue
+        duration = float(end_times[end - 1] - start_times[start])
+        if duration < min_note_duration:
+            continue
+        previous = events[-1] if events else None
+        if previous is not None and previous['midi'] == note and bridgeable:
+            # Same note resumed right after a dropped blip: extend it
+            previous['end_time'] = float(end_times[end - 1])
+            previous['duration'] = previous['end_time'] - previous['start_time']
+            previous['frames'] += int(end - start)
+            continue
+        bridgeable = True
+        events.append({
+            'start_time': float(start_times[start]),
+            'end_time': float(end_times[end - 1]),
+            'duration': duration,
+            'midi': note,
+            'note': midi_to_note_name(note),
+            'estimated_frequency': float(np.median(frequencies[start:end])),
+            'confidence': float(np.mean(confidence[start:end])),
+            'frames': int(end - start),
+        })
+    return events
+
+
+def rhythm_unit(notes: List[Dict], max_columns_per_note: int = 16) -> Optional[float]:
+    """
+    Pick the tab column duration for generate_tab: the shortest note gets
+    one column, but no note spans more than max_columns_per_note columns.
+    """
+    durations = [note['duration'] for note in notes if note.get('duration', 0) > 0]
+    if not durations:
+        return None
+    return max(min(durations), max(durations) / max_columns_per_note)
+
+
+# Regression check: python note_segmentation.py
+if __name__ == '__main__':
+    hop = 0.01
+
+    def frames(parts):
+        # parts: (frequency, confidence, seconds); a None frequency leaves a time gap
+        out, t = [], 0.0
+        for frequency, confidence, seconds in parts:
+            for _ in range(int(round(seconds / hop))):
+                if frequency is not None:
+                    out.append({'start_time': t, 'end_time': t + hop,
+                                'estimated_frequency': frequency, 'confidence': confidence})
+                t += hop
+        return out
+
+    # Repeated notes separated by unvoiced rests stay separate
+    repeated = segment_notes(frames([(440.0, 0.9, 0.2), (440.0, 0.05, 0.04)] * 4))
+    assert [n['note'] for n in repeated] == ['A4'] * 4, repeated
+
+    # ...and so do notes separated by a hole in the frames
+    holed = segment_notes(frames([(440.0, 0.9, 0.2), (None, 0, 0.05), (440.0, 0.9, 0.2)]))
+    assert len(holed) == 2, holed
+
+    # A short voiced blip inside a sustained note is bridged
+    blip = segment_notes(frames([(440.0, 0.9, 0.3), (523.25, 0.9, 0.03), (440.0, 0.9, 0.3)]))
+    assert [n['note'] for n in blip] == ['A4'] and blip[0]['duration'] > 0.6, blip
+
+    print("note_segmentation: all checks passed")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Sharded multi-core pitch estimation for a single long track.
+
+The track is cut into overlapping time shards that are analyzed in worker
+processes. Shard boundaries sit on segment boundaries and every shard carries
+at least one segment of overlap on each side, so a segment that crosses a
+boundary is always analyzed in full by the shard that owns its start. Each
+worker only analyzes the segments starting in its own range, and merging
+keeps each estimate only from its owning shard, which makes the result
+identical to a serial run.
+
+Workers never receive the samples themselves: the track is placed in shared
+memory once (or memory-mapped from the PCM cache) and each task only carries
+a small descriptor.
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+
+from cancellation import CancellationToken, check_cancelled
+from pitch_analysis import estimate_segment_pitches
+from shared_audio import MappedPCM, SharedAudioManager, SharedPCM, attach_pcm
+
+# (own_start, own_end, window_start, window_end) in track samples
+Shard = Tuple[int, int, int, int]
+
+
+def plan_shards(total_samples: int, segment_length: int, shard_length: int,
+                overlap: int) -> List[Shard]:
+    """
+    Split a track into segment-aligned shards with overlapping windows.
+
+    Args:
+        total_samples: Number of mono samples in the track
+        segment_length: Length of each analysis segment in samples
+        shard_length: Requested number of samples owned by each shard
+        overlap: Requested overlap on each side of a shard in samples
+
+    Returns:
+        List of (own_start, own_end, window_start, window_end) tuples
+    """
+    # Round both up to whole segments so ownership follows the serial grid
+    shard_length = max(1, -(-shard_length // segment_length)) * segment_length
+    overlap = max(1, -(-overlap // segment_length)) * segment_length
+
+    shards = []
+    for own_start in range(0, total_samples, shard_length):
+        own_end = min(own_start + shard_length, total_samples)
+        window_start = max(0, own_start - overlap)
+        window_end = min(total_samples, own_end + overlap)
+        shards.append((own_start, own_end, window_start, window_end))
+    return shards
+
+
+def merge_shard_estimates(shard_results: List[Tuple[Shard, List[Dict]]],
+                          sample_rate: int) -> List[Dict]:
+    """
+    Merge per-shard estimates, dropping duplicates from the overlaps.
+
+    An estimate is kept only by the shard that owns its start sample, and any
+    remaining estimates with the same start time are collapsed into one.
+
+    Args:
+        shard_results: List of (shard, estimates) pairs in any order
+        sample_rate: Sample rate of the audio in Hz
+
+    Returns:
+        Merged pitch estimates sorted by start time
+    """
+    merged = {}
+    for (own_start, own_end, _, _), estimates in shard_results:
+        own_start_time = own_start / sample_rate
+        own_end_time = own_end / sample_rate
+        for estimate in estimates:
+            if own_start_time <= estimate['start_time'] < own_end_time:
+                merged.setdefault(estimate['start_time'], estimate)
+    return [merged[start_time] for start_time in sorted(merged)]
+
+
+def _analyze_shard(descriptor: Union[SharedPCM, MappedPCM], sample_rate: int, segment_length: int,
+                   shard: Shard, deadline: Optional[float] = None) -> Tuple[Shard, List[Dict]]:
+    """Worker entry point: analyze the segments starting inside the shard it owns."""
+    own_start, own_end, window_start, window_end = shard
+    # time.monotonic() is system-wide, so the parent's deadline holds here too
+    cancel_token = CancellationToken(deadline=deadline) if deadline is not None else None
+    with attach_pcm(descriptor) as samples:
+        # The overlap only supplies the samples of a segment crossing own_end;
+        # segments owned by neighbouring shards are not analyzed here at all
+        estimates = estimate_segment_pitches(samples[window_start:window_end], sample_rate,
+                                             segment_length, start=own_start, stop=own_end,
+                                             offset=window_start, cancel_token=cancel_token)
+    return shard, estimates
+
+
+def sharded_pitch_estimation(samples: Union[np.ndarray, SharedPCM, MappedPCM], sample_rate: int,
+                             segment_duration: float = 1.0,
+                             workers: Optional[int] = None,
+                             shard_duration: float = 60.0,
+                             overlap_duration: Optional[float] = None,
+                             cancel_token: Optional[CancellationToken] = None) -> List[Dict]:
+    """
+    Run pitch estimation over a mono signal using several worker processes.
+
+    Args:
+        samples: Mono audio samples for the whole track, or a SharedPCM /
+            MappedPCM descriptor for samples already in shared memory or on disk
+        sample_rate: Sample rate of the audio in Hz
+        segment_duration: Duration of each analysis segment in seconds
+        workers: Number of worker processes (default: os.cpu_count())
+        shard_duration: Duration owned by each shard in seconds
+        overlap_duration: Overlap on each side of a shard in seconds
+            (default and minimum: one segment)
+        cancel_token: Optional token; pending shards are dropped once it is
+            cancelled and running shards stop at its deadline
+
+    Returns:
+        Pitch estimates identical to a serial run over the same samples
+    """
+    segment_length = int(segment_duration * sample_rate)
+    if overlap_duration is None:
+        overlap_duration = segment_duration
+    total_samples = samples.shape[0]
+    shards = plan_shards(total_samples, segment_length,
+                         int(shard_duration * sample_rate),
+                         int(overlap_duration * sample_rate))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(shards) == 1:
+        if isinstance(samples, (SharedPCM, MappedPCM)):
+            with attach_pcm(samples) as shared_samples:
+                return estimate_segment_pitches(shared_samples, sample_rate, segment_length,
+                                                cancel_token=cancel_token)
+        return estimate_segment_pitches(samples, sample_rate, segment_length,
+                                        cancel_token=cancel_token)
+
+    if isinstance(samples, (SharedPCM, MappedPCM)):
+        return _run_shards(samples, sample_rate, segment_length, shards, workers, cancel_token)
+    with SharedAudioManager() as manager, manager.shared(samples) as descriptor:
+        return _run_shards(descriptor, sample_rate, segment_length, shards, workers, cancel_token)
+
+
+def _run_shards(descriptor: Union[SharedPCM, MappedPCM], sample_rate: int, segment_length: int,
+                shards: List[Shard], workers: int,
+                cancel_token: Optional[CancellationToken] = None) -> List[Dict]:
+    deadline = cancel_token.deadline if cancel_token is not None else None
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(shards)))
+    try:
+        pending = {
+            pool.submit(_analyze_shard, descriptor, sample_rate, segment_length, shard, deadline)
+            for shard in shards
+        }
+        shard_results = []
+        while pending:
+            # Wake up periodically so an explicit cancel() is noticed promptly
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            shard_results.extend(future.result() for future in done)
+            check_cancelled(cancel_token)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return merge_shard_estimates(shard_results, sample_rate)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of decoded PCM for fast re-analysis.
+
+Decoding m4a/webm/mp3 through pydub/ffmpeg costs more than the analysis
+itself, so the decoded float32 mono samples are stored as .npy files in a
+pcm_cache/ subdirectory of the audio output directory (which cleanup()
+leaves alone), keyed by the source file's hash and the decode settings. Cached audio is opened with np.load(mmap_mode='r'), so re-analysis
+skips decoding and only pages in the samples it actually touches.
+"""
+
+import glob
+import hashlib
+import os
+import tempfile
+from typing import Optional, Tuple
+import numpy as np
+
+from cancellation import CancellationToken, check_cancelled
+from shared_audio import MappedPCM
+
+# Bump when the decode pipeline changes so stale entries are never reused
+CACHE_FORMAT_VERSION = 1
+CACHE_SUFFIX = '.pcm.npy'
+
+
+class PCMCache:
+    """Decoded PCM cache with size-based LRU eviction."""
+
+    def __init__(self, cache_dir: str = os.path.join("temp_audio", "pcm_cache"), max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_key(self, audio_file_path: str, sample_rate: Optional[int] = None) -> str:
+        """
+        Build the cache key for a source file and decode settings.
+
+        Args:
+            audio_file_path: Path to the source audio file
+            sample_rate: Target sample rate, or None to keep the native rate
+
+        Returns:
+            Hex digest identifying the decoded PCM
+        """
+        digest = hashlib.sha256()
+        with open(audio_file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(f"|v{CACHE_FORMAT_VERSION}|rate={sample_rate or 'native'}|mono|float32".encode())
+        return digest.hexdigest()
+
+    def _find(self, key: str) -> Optional[Tuple[str, int]]:
+        for path in glob.glob(os.path.join(self.cache_dir, f"{key}.*hz{CACHE_SUFFIX}")):
+            rate = os.path.basename(path)[len(key) + 1:-len(CACHE_SUFFIX) - 2]
+            if rate.isdigit():
+                return path, int(rate)
+        return None
+
+    def _decode(self, audio_file_path: str, sample_rate: Optional[int],
+                cancel_token: Optional[CancellationToken] = None) -> Tuple[np.ndarray, int]:
+        from pydub import AudioSegment
+
+        audio = AudioSegment.from_file(audio_file_path)
+        check_cancelled(cancel_token)
+        audio = audio.set_channels(1)
+        if sample_rate:
+            audio = audio.set_frame_rate(sample_rate)
+        check_cancelled(cancel_token)
+
+        sample_width = audio.sample_width
+        if sample_width == 1:
+            raw = np.frombuffer(audio.raw_data, dtype=np.uint8)
+        else:
+            raw = np.frombuffer(audio.raw_data, dtype=f'<i{sample_width}')
+        zero = 128.0 if sample_width == 1 else 0.0
+        scale = float(1 << (8 * sample_width - 1))
+
+        # Convert in chunks so a cancelled request stops mid-way
+        samples = np.empty(len(raw), dtype=np.float32)
+        chunk = audio.frame_rate * 10
+        for i in range(0, len(raw), chunk):
+            check_cancelled(cancel_token)
+            samples[i:i + chunk] = (raw[i:i + chunk] - zero) / scale
+        return samples, audio.frame_rate
+
+    def descriptor(self, audio_file_path: str, sample_rate: Optional[int] = None,
+                   cancel_token: Optional[CancellationToken] = None) -> Tuple[MappedPCM, int]:
+        """
+        Return a MappedPCM descriptor for the decoded audio, decoding on a miss.
+
+        Args:
+            audio_file_path: Path to the source audio file
+            sample_rate: Target sample rate, or None to keep the native rate
+            cancel_token: Optional token checked while decoding on a miss
+
+        Returns:
+            Tuple of (descriptor for the cached .npy file, sample rate)
+        """
+        key = self.cache_key(audio_file_path, sample_rate)
+        found = self._find(key)
+        if found:
+            path, rate = found
+            os.utime(path)  # mark as recently used
+            print(f"PCM cache hit: {os.path.basename(path)}")
+        else:
+            print(f"PCM cache miss, decoding: {audio_file_path}")
+            samples, rate = self._decode(audio_file_path, sample_rate, cancel_token)
+            path = os.path.join(self.cache_dir, f"{key}.{rate}hz{CACHE_SUFFIX}")
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, samples)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self.evict(keep=path)
+
+        samples = np.load(path, mmap_mode='r')
+        return MappedPCM(path, samples.shape, samples.dtype.str), rate
+
+    def load(self, audio_file_path: str, sample_rate: Optional[int] = None,
+             cancel_token: Optional[CancellationToken] = None) -> Tuple[np.ndarray, int]:
+        """
+        Return decoded float32 mono samples as a read-only memory map.
+
+        Args:
+            audio_file_path: Path to the source audio file
+            sample_rate: Target sample rate, or None to keep the native rate
+            cancel_token: Optional token checked while decoding on a miss
+
+        Returns:
+            Tuple of (memory-mapped samples, sample rate)
+        """
+        descriptor, rate = self.descriptor(audio_file_path, sample_rate, cancel_token)
+        return np.load(descriptor.path, mmap_mode='r'), rate
+
+    def size_bytes(self) -> int:
+        total = 0
+        for path in glob.glob(os.path.join(self.cache_dir, f"*{CACHE_SUFFIX}")):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, f"*{CACHE_SUFFIX}")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                print(f"PCM cache evicted: {os.path.basename(path)}")
+            except OSError:
+                pass
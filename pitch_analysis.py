@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Pitch estimation kernel shared by the serial and sharded analysis paths.
+Only depends on numpy so it can be imported cheaply by worker processes.
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+
+from cancellation import CancellationToken, check_cancelled
+
+
+def estimate_segment_pitches(samples: np.ndarray, sample_rate: int, segment_length: int,
+                             start: int = 0, stop: Optional[int] = None,
+                             offset: int = 0,
+                             cancel_token: Optional[CancellationToken] = None) -> List[Dict]:
+    """
+    Estimate the dominant frequency of each fixed-length segment of a mono signal.
+
+    Segments are aligned to multiples of segment_length from the start of the
+    track, so any [start, stop) window gives exactly the segments a full run
+    would give for that window.
+
+    Args:
+        samples: Mono audio samples, either the whole track or a slice of it
+        sample_rate: Sample rate of the audio in Hz
+        segment_length: Length of each analysis segment in samples
+        start: First track sample to analyze (rounded up to a segment boundary)
+        stop: Segments must start before this track sample (default: end of samples)
+        offset: Track sample index of samples[0] when samples is a slice
+        cancel_token: Optional token checked before each segment
+
+    Returns:
+        List of pitch estimates for each segment with a peak above 80 Hz
+    """
+    end = offset + len(samples)
+    if stop is None:
+        stop = end
+    start = max(start, offset)
+    start = -(-start // segment_length) * segment_length
+
+    pitch_estimates = []
+    freqs = np.fft.fftfreq(segment_length, 1/sample_rate)
+
+    for i in range(start, min(stop, end), segment_length):
+        check_cancelled(cancel_token)
+        segment = samples[i - offset:i - offset + segment_length]
+        if len(segment) < segment_length:
+            break
+
+        fft = np.fft.fft(segment)
+
+        magnitude_spectrum = np.abs(fft)
+        peak_idx = np.argmax(magnitude_spectrum[1:len(magnitude_spectrum)//2]) + 1
+        peak_frequency = abs(freqs[peak_idx])
+
+        if peak_frequency > 80:  # Hz
+            pitch_estimates.append({
+                'start_time': i / sample_rate,
+                'end_time': (i + segment_length) / sample_rate,
+                # Plain floats: float32 input gives numpy float32, which JSON rejects
+                'estimated_frequency': float(peak_frequency),
+                'confidence': float(magnitude_spectrum[peak_idx] / np.max(magnitude_spectrum))
+            })
+
+    return pitch_estimates
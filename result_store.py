@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+On-disk store of transcription results in a compact binary format.
+
+Each result is saved as an uncompressed .npz of column arrays (times,
+frequency, confidence, MIDI number, note name codes) plus its own metadata,
+so there is no shared index for concurrent workers to race on. Reads
+memory-map the columns straight out of the archive, and because estimates
+are stored sorted by time, a start/end window is located with a binary
+search. A page therefore only touches the parts of the file it returns,
+not the whole result. Old results are evicted by age and total size.
+"""
+
+import glob
+import json
+import os
+import re
+import struct
+import tempfile
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+
+from midi_export import estimates_to_midi, frequency_to_midi
+from note_segmentation import segment_notes
+
+RESULT_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ResultStore:
+    """Saves pitch estimates as .npz files and answers time-range queries."""
+
+    def __init__(self, store_dir: str = os.path.join("temp_audio", "results"),
+                 max_bytes: int = 512 * 1024 * 1024, max_age: Optional[float] = 7 * 24 * 3600):
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _npz_path(self, result_id: str) -> str:
+        if not RESULT_ID_PATTERN.match(result_id):
+            raise KeyError(result_id)
+        return os.path.join(self.store_dir, f"{result_id}.npz")
+
+    def save(self, pitch_estimates: List[Dict], source: Optional[str] = None) -> str:
+        """
+        Store pitch estimates and return the new result id.
+
+        Args:
+            pitch_estimates: List of estimate dicts as produced by the extractors
+            source: Audio file or URL the estimates came from
+
+        Returns:
+            Result id used by query(), npz_path() and midi()
+        """
+        estimates = sorted(pitch_estimates, key=lambda est: est['start_time'])
+        notes = sorted({est['note'] for est in estimates if 'note' in est})
+        note_codes = {note: code for code, note in enumerate(notes)}
+
+        def midi_number(est):
+            midi = est.get('midi')
+            if midi is None:
+                midi = frequency_to_midi(est.get('estimated_frequency', 0))
+            return -1 if midi is None or not 0 <= midi <= 127 else midi
+
+        meta = {
+            'source': source,
+            'count': len(estimates),
+            'start_time': estimates[0]['start_time'] if estimates else 0.0,
+            'end_time': estimates[-1]['end_time'] if estimates else 0.0,
+            'created': datetime.now().isoformat(),
+        }
+
+        result_id = uuid.uuid4().hex
+        path = self._npz_path(result_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            # Uncompressed, so readers can memory-map each column
+            np.savez(
+                f,
+                start_time=np.array([est['start_time'] for est in estimates], dtype=np.float64),
+                end_time=np.array([est['end_time'] for est in estimates], dtype=np.float64),
+                estimated_frequency=np.array([est.get('estimated_frequency', 0.0) for est in estimates],
+                                             dtype=np.float32),
+                confidence=np.array([est.get('confidence', 0.0) for est in estimates], dtype=np.float32),
+                midi=np.array([midi_number(est) for est in estimates], dtype=np.int16),
+                note_code=np.array([note_codes.get(est.get('note'), -1) for est in estimates], dtype=np.int16),
+                note_names=np.array(notes, dtype=str),
+                meta=np.array(json.dumps(meta)),
+            )
+        os.replace(tmp_path, path)
+
+        self.evict(keep=path)
+        return result_id
+
+    def info(self, result_id: str) -> Dict:
+        """Metadata saved with a result. Raises KeyError if it does not exist."""
+        return self._meta(self._open(result_id))
+
+    def npz_path(self, result_id: str) -> str:
+        """Path of the packed .npz for a result. Raises KeyError if missing."""
+        path = self._npz_path(result_id)
+        if not os.path.exists(path):
+            raise KeyError(result_id)
+        return path
+
+    def _open(self, result_id: str) -> Dict[str, np.ndarray]:
+        """
+        Memory-map every column of a result's .npz.
+
+        Members of an uncompressed .npz are plain .npy files stored verbatim,
+        so each one is mapped at its offset inside the archive. Compressed,
+        empty and 0-d members are read instead.
+        """
+        path = self.npz_path(result_id)
+        columns = {}
+        try:
+            with open(path, 'rb') as f, zipfile.ZipFile(f) as archive:
+                for member in archive.infolist():
+                    name = member.filename[:-len('.npy')]
+                    if member.compress_type != zipfile.ZIP_STORED:
+                        with archive.open(member) as data:
+                            columns[name] = np.lib.format.read_array(data)
+                        continue
+                    # The local header's extra field may differ from the central directory's
+                    f.seek(member.header_offset + 26)
+                    name_length, extra_length = struct.unpack('<HH', f.read(4))
+                    f.seek(member.header_offset + 30 + name_length + extra_length)
+                    version = np.lib.format.read_magic(f)
+                    if version == (1, 0):
+                        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+                    else:
+                        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+                    if not shape or 0 in shape:
+                        columns[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+                        continue
+                    columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                              order='F' if fortran_order else 'C')
+        except (OSError, ValueError, zipfile.BadZipFile):
+            raise KeyError(result_id)
+        return columns
+
+    @staticmethod
+    def _meta(columns: Dict[str, np.ndarray]) -> Dict:
+        return json.loads(str(columns['meta'][()]))
+
+    def query(self, result_id: str, start: Optional[float] = None, end: Optional[float] = None,
+              offset: int = 0, limit: Optional[int] = None) -> Dict:
+        """
+        Return the estimates overlapping [start, end), one page at a time.
+
+        Args:
+            result_id: Id returned by save()
+            start: Window start in seconds (default: beginning)
+            end: Window end in seconds (default: end of result)
+            offset: Number of matching estimates to skip
+            limit: Maximum number of estimates to return (default: all)
+
+        Returns:
+            Dictionary with the page of estimates, total matches, next_offset
+            and the result's metadata under 'info'
+        """
+        data = self._open(result_id)
+        start_times, end_times = data['start_time'], data['end_time']
+
+        # Estimates are sorted and non-overlapping, so both columns are sorted
+        lo = 0 if start is None else int(np.searchsorted(end_times, start, side='right'))
+        hi = len(start_times) if end is None else int(np.searchsorted(start_times, end, side='left'))
+        total = max(0, hi - lo)
+        page_lo = lo + min(max(0, offset), total)
+        page_hi = hi if limit is None else min(hi, page_lo + max(0, limit))
+
+        # Copy just the page out of the mapped columns
+        page = slice(page_lo, page_hi)
+        note_names = data['note_names'].tolist()
+        estimates = []
+        for start_time, end_time, frequency, confidence, note_code, midi in zip(
+                start_times[page].tolist(), end_times[page].tolist(),
+                data['estimated_frequency'][page].tolist(), data['confidence'][page].tolist(),
+                data['note_code'][page].tolist(), data['midi'][page].tolist()):
+            est = {
+                'start_time': start_time,
+                'end_time': end_time,
+                'estimated_frequency': frequency,
+                'confidence': confidence,
+            }
+            if note_code >= 0:
+                est['note'] = note_names[note_code]
+            if midi >= 0:
+                est['midi'] = midi
+            estimates.append(est)
+
+        next_offset = page_hi - lo
+        return {
+            'result_id': result_id,
+            'start': start,
+            'end': end,
+            'offset': page_lo - lo,
+            'total': total,
+            'next_offset': next_offset if next_offset < total else None,
+            'pitch_estimates': estimates,
+            'info': self._meta(data),
+        }
+
+    def midi(self, result_id: str, start: Optional[float] = None, end: Optional[float] = None) -> bytes:
+        """
+        Standard MIDI File for a result, optionally limited to a time window.
+        Estimates are collapsed into note events first, so a sustained note
+        is written once rather than re-struck on every frame.
+        """
+        page = self.query(result_id, start=start, end=end)
+        return estimates_to_midi(segment_notes(page['pitch_estimates']))
+
+    def export_midi(self, result_id: str) -> str:
+        """Write a result's MIDI file next to its .npz and return the path."""
+        midi = self.midi(result_id)
+        path = os.path.splitext(self._npz_path(result_id))[0] + '.mid'
+        with open(path, 'wb') as f:
+            f.write(midi)
+        return path
+
+    def _remove(self, npz_path: str):
+        os.remove(npz_path)
+        try:
+            os.remove(os.path.splitext(npz_path)[0] + '.mid')
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove results older than max_age, then the oldest until the store fits in max_bytes."""
+        entries = []
+        for path in glob.glob(os.path.join(self.store_dir, "*.npz")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        cutoff = None if self.max_age is None else time.time() - self.max_age
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            expired = cutoff is not None and mtime < cutoff
+            if not expired and total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                self._remove(path)
+                total -= size
+                print(f"Result evicted: {os.path.basename(path)}")
+            except OSError:
+                pass
+
+    def clear(self):
+        """Delete all stored results."""
+        for path in glob.glob(os.path.join(self.store_dir, "*.npz")):
+            try:
+                self._remove(path)
+            except OSError as e:
+                print(f"Error removing {path}: {str(e)}")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Zero-copy hand-off of decoded PCM to worker processes.
+
+Decoded samples are placed once in multiprocessing.shared_memory and workers
+receive a small picklable SharedPCM descriptor instead of the array itself.
+Audio already cached on disk as .npy travels as a MappedPCM descriptor and
+is memory-mapped by each worker instead.
+SharedAudioManager owns the segments and unlinks them when a job finishes,
+raises, or the process exits.
+"""
+
+import atexit
+import sys
+import threading
+import weakref
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterator, NamedTuple, Tuple, Union
+import numpy as np
+
+
+# Guards the resource_tracker.register swap in _open_untracked
+_tracker_lock = threading.Lock()
+
+
+def _open_untracked(name: str) -> shared_memory.SharedMemory:
+    """
+    Open an existing segment without registering it with the resource tracker.
+
+    Before Python 3.13 every attach registers the segment, so a worker with its
+    own tracker would unlink the creator's audio when it exits.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    with _tracker_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedPCM(NamedTuple):
+    """Picklable descriptor for PCM samples living in shared memory."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class MappedPCM(NamedTuple):
+    """Picklable descriptor for PCM samples stored in an .npy file on disk."""
+    path: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class SharedAudioManager:
+    """Creates shared-memory PCM segments and guarantees they get unlinked."""
+
+    def __init__(self):
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+        self._lock = threading.Lock()
+        _live_managers.add(self)
+
+    def allocate(self, shape: Tuple[int, ...], dtype) -> Tuple[SharedPCM, np.ndarray]:
+        """
+        Allocate an empty shared segment so a decoder can write into it directly.
+
+        Returns:
+            The descriptor to hand to workers and a writable view of the segment
+        """
+        dtype = np.dtype(dtype)
+        nbytes = max(1, int(np.prod(shape)) * dtype.itemsize)
+        with _tracker_lock:
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        with self._lock:
+            self._segments[shm.name] = shm
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        return SharedPCM(shm.name, tuple(shape), dtype.str), array
+
+    def share(self, samples: np.ndarray) -> SharedPCM:
+        """Copy samples into a new shared segment and return its descriptor."""
+        descriptor, array = self.allocate(samples.shape, samples.dtype)
+        array[...] = samples
+        return descriptor
+
+    def release(self, descriptor: SharedPCM):
+        """Close and unlink one segment. Releasing twice is a no-op."""
+        with self._lock:
+            shm = self._segments.pop(descriptor.name, None)
+        if shm is None:
+            return
+        try:
+            shm.close()
+        except BufferError:
+            # A view is still alive in this process; unlinking is what matters
+            pass
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def shared(self, samples: np.ndarray) -> Iterator[SharedPCM]:
+        """Share samples for the duration of a job, releasing them even on error."""
+        descriptor = self.share(samples)
+        try:
+            yield descriptor
+        finally:
+            self.release(descriptor)
+
+    def active_segments(self) -> int:
+        with self._lock:
+            return len(self._segments)
+
+    def close(self):
+        """Release every segment still owned by this manager."""
+        with self._lock:
+            names = list(self._segments)
+        for name in names:
+            self.release(SharedPCM(name, (), ''))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_live_managers = weakref.WeakSet()
+
+
+@atexit.register
+def _release_all():
+    for manager in list(_live_managers):
+        manager.close()
+
+
+class _AttachedSegment:
+    """
+    Owns an attached SharedMemory handle and exposes it to numpy.
+
+    Arrays built from it (and every view of them) keep it alive through
+    their base, so the segment is only unmapped once nothing can read it.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, ...], dtype: np.dtype):
+        self._shm = shm
+        address = np.frombuffer(shm.buf, dtype=np.uint8).ctypes.data
+        self.__array_interface__ = {
+            'shape': tuple(shape),
+            'typestr': dtype.str,
+            'data': (address, True),  # read-only
+            'version': 3,
+        }
+
+    def __del__(self):
+        try:
+            self._shm.close()
+        except Exception:
+            pass
+
+
+@contextmanager
+def attach_pcm(descriptor: Union[SharedPCM, MappedPCM]) -> Iterator[np.ndarray]:
+    """
+    Map a shared PCM segment into this process as a read-only array.
+
+    Attaching never copies audio and never takes ownership of the segment.
+    The mapping stays open for as long as the array or any view of it is
+    referenced, so keeping a slice after the with block is safe. A MappedPCM
+    is opened as a read-only memory map, so only the pages read are loaded.
+    """
+    if isinstance(descriptor, MappedPCM):
+        yield np.load(descriptor.path, mmap_mode='r')
+        return
+    shm = _open_untracked(descriptor.name)
+    yield np.asarray(_AttachedSegment(shm, descriptor.shape, np.dtype(descriptor.dtype)))
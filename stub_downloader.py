@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for YouTube downloads, used by load tests.
+
+StubDownloader serves local fixture files instead of hitting YouTube, after
+a configurable simulated download latency. Plug it into SimpleAudioExtractor
+through its downloader argument, or set AUDIO_STUB_FIXTURES (and optionally
+AUDIO_STUB_LATENCY / AUDIO_STUB_JITTER) so app.py does it for every worker.
+"""
+
+import hashlib
+import os
+import random
+import shutil
+import time
+from typing import List, Optional
+
+from cancellation import CancellationToken, check_cancelled
+
+FIXTURE_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.webm', '.ogg')
+
+
+class StubDownloader:
+    """
+    Serves fixture audio files as if they were downloaded from YouTube.
+
+    Args:
+        fixtures_dir: Directory containing fixture audio files
+        latency: Simulated download time in seconds
+        jitter: Extra uniformly random latency in seconds
+        failure_rate: Fraction of downloads that fail (return None)
+    """
+
+    def __init__(self, fixtures_dir: str, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0):
+        self.fixtures: List[str] = sorted(
+            os.path.join(fixtures_dir, name) for name in os.listdir(fixtures_dir)
+            if name.lower().endswith(FIXTURE_EXTENSIONS)
+        )
+        if not self.fixtures:
+            raise ValueError(f"No audio fixtures found in {fixtures_dir}")
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+    @classmethod
+    def from_env(cls) -> Optional['StubDownloader']:
+        """Build a stub from AUDIO_STUB_* environment variables, if configured."""
+        fixtures_dir = os.environ.get('AUDIO_STUB_FIXTURES')
+        if not fixtures_dir:
+            return None
+        return cls(fixtures_dir,
+                   latency=float(os.environ.get('AUDIO_STUB_LATENCY', 0.0)),
+                   jitter=float(os.environ.get('AUDIO_STUB_JITTER', 0.0)),
+                   failure_rate=float(os.environ.get('AUDIO_STUB_FAILURE_RATE', 0.0)))
+
+    def __call__(self, youtube_url: str, output_dir: str,
+                 cancel_token: Optional[CancellationToken] = None) -> Optional[str]:
+        """
+        Link the fixture chosen for this URL into output_dir.
+
+        The same URL always maps to the same fixture, and each call gets its
+        own file name so concurrent requests never share a path.
+
+        Returns:
+            Path to the linked file, or None for a simulated failure
+        """
+        delay = self.latency + random.uniform(0, self.jitter)
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline:
+            check_cancelled(cancel_token)
+            time.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+        check_cancelled(cancel_token)
+
+        if self.failure_rate and random.random() < self.failure_rate:
+            print(f"Stub download failed for: {youtube_url}")
+            return None
+
+        digest = hashlib.sha1(youtube_url.encode()).hexdigest()
+        fixture = self.fixtures[int(digest, 16) % len(self.fixtures)]
+        ext = os.path.splitext(fixture)[1]
+        file_path = os.path.join(output_dir, f"stub_{digest[:12]}_{os.getpid()}_{time.monotonic_ns()}{ext}")
+        if cancel_token is not None:
+            cancel_token.track_file(file_path)
+        link_or_copy(fixture, file_path)
+        print(f"Stub audio served: {file_path}")
+        return file_path
+
+
+def link_or_copy(source: str, destination: str):
+    """
+    Hardlink source to destination, falling back to a symlink and then a copy.
+    Links cost no disk space and removing them leaves the fixture intact.
+    """
+    try:
+        os.link(source, destination)
+        return
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.abspath(source), destination)
+        return
+    except OSError:
+        pass
+    shutil.copyfile(source, destination)
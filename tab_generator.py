@@ -1,5 +1,6 @@
 # Simple single-note guitar tab generator
 # Usage: generate_tab(pitch_estimates) -> str
+#        generate_tab(segment_notes(frames), column_duration=...) for rhythmic spacing
 
 # Standard tuning (EADGBE), string 6 is low E
 STANDARD_TUNING = [40, 45, 50, 55, 59, 64]  # MIDI numbers for E2, A2, D3, G3, B3, E4
@@ -31,27 +32,25 @@ def find_string_and_fret(midi_num):
                 best = (i, fret)
     return best  # (string_index, fret) or None
 
-def generate_tab(pitch_estimates, notes_per_measure=16, measures_per_line=4):
-    # Each pitch_estimate: {'note': 'A4', ...}
+def generate_tab(pitch_estimates, notes_per_measure=16, measures_per_line=4, column_duration=None,
+                 max_rest_columns=16):
+    # Each pitch_estimate: {'note': 'A4', ...} or a note event with 'midi'
+    # If column_duration (seconds) is given, each note spans duration / column_duration
+    # columns and gaps between notes become rests, so spacing follows the rhythm.
+    # A rest is capped at max_rest_columns so long silences don't grow the tab.
     tab_lines = [list(STRING_NAMES[i] + '|') for i in range(6)]
     note_count = 0
     measure_count = 0
-    for est in pitch_estimates:
-        midi = note_name_to_midi(est['note'])
-        if midi is None:
-            # Add a rest (dash) to all strings
-            for line in tab_lines:
-                line.append('-')
-            note_count += 1
-        else:
-            pos = find_string_and_fret(midi)
-            for i in range(6):
-                if pos is not None and i == pos[0]:
-                    line_val = str(pos[1]) if pos[1] < 10 else str(pos[1])
-                    tab_lines[i].append(line_val)
-                else:
-                    tab_lines[i].append('-')
-            note_count += 1
+
+    def add_column(pos):
+        nonlocal note_count, measure_count
+        for i in range(6):
+            if pos is not None and i == pos[0]:
+                line_val = str(pos[1]) if pos[1] < 10 else str(pos[1])
+                tab_lines[i].append(line_val)
+            else:
+                tab_lines[i].append('-')
+        note_count += 1
         # Add bar line at measure boundary
         if note_count % notes_per_measure == 0:
             for line in tab_lines:
@@ -61,6 +60,27 @@ def generate_tab(pitch_estimates, notes_per_measure=16, measures_per_line=4):
         if measure_count > 0 and measure_count % measures_per_line == 0 and note_count % notes_per_measure == 0:
             for i in range(6):
                 tab_lines[i].append('\n' + STRING_NAMES[i] + '|')
+
+    previous_end = None
+    for est in pitch_estimates:
+        midi = est.get('midi')
+        if midi is None:
+            midi = note_name_to_midi(est['note'])
+        columns = 1
+        if column_duration:
+            start = est.get('start_time')
+            if previous_end is not None and start is not None:
+                # Rest for the silence since the previous note
+                rest_columns = int(round((start - previous_end) / column_duration))
+                for _ in range(min(rest_columns, max_rest_columns)):
+                    add_column(None)
+            duration = est.get('duration', est.get('end_time', 0) - est.get('start_time', 0))
+            columns = max(1, int(round(duration / column_duration)))
+            previous_end = est.get('end_time', previous_end)
+        # A missing note is a rest (dash) on all strings
+        add_column(None if midi is None else find_string_and_fret(midi))
+        for _ in range(columns - 1):
+            add_column(None)
     # Join lines
     # Remove trailing bar if present
     tab_strs = []